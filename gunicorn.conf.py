@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+
+# Run with: gunicorn main:app
+# UvicornWorker picks uvloop and httptools automatically when installed.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+keepalive = 5
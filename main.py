@@ -1,17 +1,32 @@
+import anyio
+import asyncio
 import bcrypt
+import hashlib
 import os
-from typing import List, Optional
-
-from fastapi import Depends, FastAPI, HTTPException, status
+from typing import Annotated, List, Optional, Tuple, Union
+
+import orjson
+from cachetools import TTLCache
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Path,
+    Request,
+    Response,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import Client
+from fastapi.responses import ORJSONResponse
+from postgrest.exceptions import APIError
+from pydantic import BaseModel
+from supabase._async.client import AsyncClient
 
 from models import (
     CompanyResponse,
     DashboardCompanyResponse,
     LoginRequest,
     LoginResponse,
-    SettingsResponse,
     SettingsUpdateRequest,
     SignupRequest,
     SignupResponse,
@@ -20,8 +35,35 @@ from supabase_client import get_supabase
 
 
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
-
-app = FastAPI(title="B2B SaaS Backend", version="1.0.0")
+# bcrypt work factor; each +1 doubles hashing cost, so tune per hardware.
+# Only affects new hashes: until existing users are rehashed, changing it
+# makes their logins take a different time than DUMMY_PASSWORD_HASH checks.
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", "12"))
+# Cost of the hashes already stored (the old bcrypt.gensalt() default)
+STORED_HASH_COST = 12
+# Checked against on unknown emails so login takes as long as for real users
+DUMMY_PASSWORD_HASH = bcrypt.hashpw(
+    b"dummy-password", bcrypt.gensalt(rounds=STORED_HASH_COST)
+)
+# Columns returned by CompanyResponse
+COMPANY_COLUMNS = "id,name,shopify_domain,api_key,access_token,created_at"
+# PostgREST error code for a single-object request that matched no rows
+NO_ROWS_ERROR_CODE = "PGRST116"
+# Largest companies.id (bigint); larger path IDs are rejected with a 422
+MAX_COMPANY_ID = 2**63 - 1
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "30"))
+
+# Per-process dashboard cache, keyed by company ID. Dashboards are only
+# written by an external process, so each worker may serve data up to the
+# TTL old. Settings are not cached: they are edited through this API and a
+# per-worker cache would serve stale credentials from the other workers.
+dashboard_cache: TTLCache = TTLCache(maxsize=10_000, ttl=CACHE_TTL_SECONDS)
+
+app = FastAPI(
+    title="B2B SaaS Backend",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 # Allow multiple origins for Vercel deployment
 allowed_origins = [
@@ -39,84 +81,153 @@ app.add_middleware(
 )
 
 
+def compute_etag(model: BaseModel) -> str:
+    """
+    Returns a strong ETag for the JSON body a response model serializes to.
+    """
+
+    body = orjson.dumps(model.model_dump())
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks whether the request's If-None-Match header covers the given ETag.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
 @app.get("/")
 def root() -> dict:
     return {"message": "Backend running!"}
 
 
 @app.get("/dashboard/{company_id}", response_model=DashboardCompanyResponse)
-def get_dashboard(
-    company_id: str, supabase: Client = Depends(get_supabase)
-) -> DashboardCompanyResponse:
+async def get_dashboard(
+    company_id: Annotated[int, Path(ge=1, le=MAX_COMPANY_ID)],
+    request: Request,
+    response: Response,
+    supabase: AsyncClient = Depends(get_supabase),
+) -> Union[DashboardCompanyResponse, Response]:
     """
     Returns dashboard data for a given company.
-    Fetches company from companies table and dashboard_data if exists.
+    Fetches company and its latest_dashboard_data row in one embedded query.
+    Answers 304 when the client's If-None-Match matches the current ETag.
     """
 
-    # Fetch company
-    company_result = (
-        supabase.table("companies")
-        .select("*")
-        .eq("id", int(company_id))
-        .maybe_single()
-        .execute()
+    cached: Optional[Tuple[DashboardCompanyResponse, str]] = dashboard_cache.get(
+        company_id
     )
+    if cached is None:
+        cached = await fetch_dashboard(company_id, supabase)
+        dashboard_cache[company_id] = cached
 
-    company_data: Optional[dict] = getattr(company_result, "data", None)
+    dashboard, etag = cached
 
-    if not company_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Company with ID {company_id} not found.",
+    if etag_matches(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
         )
 
-    # Fetch dashboard data if exists (most recent first)
-    dashboard_result = (
-        supabase.table("dashboard_data")
-        .select("*")
-        .eq("company_id", int(company_id))
-        .order("created_at", desc=True)
-        .limit(1)
-        .maybe_single()
-        .execute()
-    )
+    response.headers["ETag"] = etag
+    return dashboard
 
-    dashboard_data: Optional[dict] = getattr(dashboard_result, "data", None)
-    data_json = dashboard_data.get("data_json") if dashboard_data else None
 
-    return DashboardCompanyResponse(
-        company_id=company_id,
+async def fetch_dashboard(
+    company_id: int, supabase: AsyncClient
+) -> Tuple[DashboardCompanyResponse, str]:
+    """
+    Loads a company's dashboard from Supabase along with its ETag.
+    """
+
+    # Fetch company with its most recent dashboard data embedded
+    try:
+        company_result = await (
+            supabase.table("companies")
+            .select("name,latest_dashboard_data(data_json)")
+            .eq("id", company_id)
+            .single()
+            .execute()
+        )
+    except APIError as e:
+        if e.code == NO_ROWS_ERROR_CODE:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Company with ID {company_id} not found.",
+            )
+        raise
+
+    company_data: dict = company_result.data
+
+    # One-to-one embed: PostgREST returns the row itself, or null if none yet
+    latest_dashboard: Optional[dict] = company_data.get("latest_dashboard_data")
+    data_json = latest_dashboard.get("data_json") if latest_dashboard else None
+
+    dashboard = DashboardCompanyResponse.model_construct(
+        company_id=str(company_id),
         name=company_data.get("name", ""),
         data=data_json if data_json else None,
     )
 
+    return dashboard, compute_etag(dashboard)
+
 
 @app.get("/settings/{company_id}", response_model=CompanyResponse)
-def get_settings(
-    company_id: str, supabase: Client = Depends(get_supabase)
-) -> CompanyResponse:
+async def get_settings(
+    company_id: Annotated[int, Path(ge=1, le=MAX_COMPANY_ID)],
+    request: Request,
+    response: Response,
+    supabase: AsyncClient = Depends(get_supabase),
+) -> Union[CompanyResponse, Response]:
     """
     Returns company settings including Shopify credentials.
     Reads from companies table which contains shopify_domain, api_key, access_token.
+    Answers 304 when the client's If-None-Match matches the current ETag.
     """
 
-    result = (
-        supabase.table("companies")
-        .select("*")
-        .eq("id", int(company_id))
-        .maybe_single()
-        .execute()
-    )
+    company, etag = await fetch_settings(company_id, supabase)
 
-    data: Optional[dict] = getattr(result, "data", None)
+    if etag_matches(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
 
-    if not data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Company with ID {company_id} not found.",
+    response.headers["ETag"] = etag
+    return company
+
+
+async def fetch_settings(
+    company_id: int, supabase: AsyncClient
+) -> Tuple[CompanyResponse, str]:
+    """
+    Loads a company's settings from Supabase along with their ETag.
+    """
+
+    try:
+        result = await (
+            supabase.table("companies")
+            .select(COMPANY_COLUMNS)
+            .eq("id", company_id)
+            .single()
+            .execute()
         )
+    except APIError as e:
+        if e.code == NO_ROWS_ERROR_CODE:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Company with ID {company_id} not found.",
+            )
+        raise
+
+    data: dict = result.data
 
-    return CompanyResponse(
+    company = CompanyResponse.model_construct(
         id=data.get("id"),
         name=data.get("name", ""),
         shopify_domain=data.get("shopify_domain"),
@@ -125,12 +236,14 @@ def get_settings(
         created_at=data.get("created_at", ""),
     )
 
+    return company, compute_etag(company)
+
 
 @app.post("/settings/{company_id}", response_model=CompanyResponse)
-def update_settings(
-    company_id: str,
+async def update_settings(
+    company_id: Annotated[int, Path(ge=1, le=MAX_COMPANY_ID)],
     payload: SettingsUpdateRequest,
-    supabase: Client = Depends(get_supabase),
+    supabase: AsyncClient = Depends(get_supabase),
 ) -> CompanyResponse:
     """
     Updates Shopify credentials for a company.
@@ -145,11 +258,10 @@ def update_settings(
         "access_token": shopify.access_token,
     }
 
-    result = (
+    result = await (
         supabase.table("companies")
         .update(update_data)
-        .eq("id", int(company_id))
-        .select()
+        .eq("id", company_id)
         .execute()
     )
 
@@ -163,7 +275,7 @@ def update_settings(
 
     company = updated_data[0]
 
-    return CompanyResponse(
+    return CompanyResponse.model_construct(
         id=company.get("id"),
         name=company.get("name", ""),
         shopify_domain=company.get("shopify_domain"),
@@ -174,19 +286,19 @@ def update_settings(
 
 
 @app.post("/auth/login", response_model=LoginResponse)
-def login(
-    payload: LoginRequest, supabase: Client = Depends(get_supabase)
+async def login(
+    payload: LoginRequest, supabase: AsyncClient = Depends(get_supabase)
 ) -> LoginResponse:
     """
     Authenticates user and returns userId and companyId.
     Checks users table for matching email and verifies password using bcrypt.
     """
 
-    # Find user by email
-    user_result = (
+    # Find user by email (stored lowercased)
+    user_result = await (
         supabase.table("users")
-        .select("*")
-        .eq("email", payload.email)
+        .select("id,password_hash,company_id")
+        .eq("email", payload.email.lower())
         .maybe_single()
         .execute()
     )
@@ -194,6 +306,11 @@ def login(
     user_data: Optional[dict] = getattr(user_result, "data", None)
 
     if not user_data:
+        # Spend the same bcrypt work as a real check to avoid leaking
+        # which emails are registered through response timing
+        await anyio.to_thread.run_sync(
+            bcrypt.checkpw, payload.password.encode("utf-8"), DUMMY_PASSWORD_HASH
+        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password.",
@@ -214,8 +331,8 @@ def login(
         stored_password_hash = stored_password_hash.encode("utf-8")
 
     try:
-        password_valid = bcrypt.checkpw(
-            payload.password.encode("utf-8"), stored_password_hash
+        password_valid = await anyio.to_thread.run_sync(
+            bcrypt.checkpw, payload.password.encode("utf-8"), stored_password_hash
         )
     except Exception as e:
         raise HTTPException(
@@ -232,26 +349,33 @@ def login(
     user_id = str(user_data.get("id"))
     company_id = str(user_data.get("company_id"))
 
-    return LoginResponse(userId=user_id, companyId=company_id)
+    return LoginResponse.model_construct(userId=user_id, companyId=company_id)
 
 
 @app.post("/auth/signup", response_model=SignupResponse)
-def signup(
-    payload: SignupRequest, supabase: Client = Depends(get_supabase)
+async def signup(
+    payload: SignupRequest, supabase: AsyncClient = Depends(get_supabase)
 ) -> SignupResponse:
     """
     Creates a new user and company.
-    First creates company, then creates user linked to that company.
+    Both rows are inserted atomically by the signup_user database function.
     Uses bcrypt to hash passwords securely.
     """
 
-    # Check if email already exists
-    existing_user = (
+    email = payload.email.lower()
+
+    # Hash password using bcrypt while checking whether the email is taken;
+    # the hash dominates latency, so the lookup is effectively free
+    salt = bcrypt.gensalt(rounds=BCRYPT_COST)
+    password_hash, existing_user = await asyncio.gather(
+        anyio.to_thread.run_sync(
+            bcrypt.hashpw, payload.password.encode("utf-8"), salt
+        ),
         supabase.table("users")
         .select("id")
-        .eq("email", payload.email)
+        .eq("email", email)
         .maybe_single()
-        .execute()
+        .execute(),
     )
 
     if getattr(existing_user, "data", None):
@@ -260,71 +384,39 @@ def signup(
             detail="Email already registered.",
         )
 
-    # Hash password using bcrypt
-    salt = bcrypt.gensalt()
-    password_hash = bcrypt.hashpw(payload.password.encode("utf-8"), salt)
     # Store as string (bcrypt hash is safe to store as string)
     password_hash_str = password_hash.decode("utf-8")
 
-    # Create company
-    company_result = (
-        supabase.table("companies")
-        .insert(
+    # Create company and user in a single transaction
+    try:
+        signup_result = await supabase.rpc(
+            "signup_user",
             {
-                "name": payload.company_name,
-                "shopify_domain": None,
-                "api_key": None,
-                "access_token": None,
-            }
-        )
-        .select()
-        .execute()
-    )
-
-    company_data: Optional[List[dict]] = getattr(company_result, "data", None)
-
-    if not company_data or len(company_data) == 0:
+                "p_email": email,
+                "p_password_hash": password_hash_str,
+                "p_company_name": payload.company_name,
+            },
+        ).execute()
+    except APIError as e:
+        if e.message == "email_taken":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered.",
+            )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create company.",
+            detail=f"Failed to create user: {e.message}",
         )
 
-    company_id = company_data[0].get("id")
+    signup_data: Optional[dict] = getattr(signup_result, "data", None)
 
-    # Create user linked to company
-    try:
-        user_result = (
-            supabase.table("users")
-            .insert(
-                {
-                    "email": payload.email,
-                    "password_hash": password_hash_str,
-                    "company_id": company_id,
-                }
-            )
-            .select()
-            .execute()
-        )
-
-        user_data: Optional[List[dict]] = getattr(user_result, "data", None)
-
-        if not user_data or len(user_data) == 0:
-            # Company was created but user creation failed - could clean up company here
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create user.",
-            )
-    except Exception as e:
-        # If user creation fails, try to clean up the company
-        try:
-            supabase.table("companies").delete().eq("id", company_id).execute()
-        except:
-            pass  # Best effort cleanup
+    if not signup_data:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create user: {str(e)}",
+            detail="Failed to create user.",
         )
 
-    user_id = str(user_data[0].get("id"))
+    user_id = str(signup_data.get("user_id"))
+    company_id = str(signup_data.get("company_id"))
 
-    return SignupResponse(userId=user_id, companyId=str(company_id))
+    return SignupResponse.model_construct(userId=user_id, companyId=company_id)
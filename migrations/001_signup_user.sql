@@ -0,0 +1,40 @@
+-- Creates a company and its first user in one transaction.
+-- Called from POST /auth/signup via supabase.rpc("signup_user", ...).
+-- Raises 'email_taken' (rolling back the company insert) when the email
+-- is already registered.
+
+create or replace function public.signup_user(
+    p_email text,
+    p_password_hash text,
+    p_company_name text
+)
+returns json
+language plpgsql
+as $$
+declare
+    v_company_id companies.id%type;
+    v_user_id users.id%type;
+begin
+    if exists (select 1 from users where email = p_email) then
+        raise exception 'email_taken';
+    end if;
+
+    insert into companies (name, shopify_domain, api_key, access_token)
+    values (p_company_name, null, null, null)
+    returning id into v_company_id;
+
+    insert into users (email, password_hash, company_id)
+    values (p_email, p_password_hash, v_company_id)
+    on conflict do nothing
+    returning id into v_user_id;
+
+    if v_user_id is null then
+        raise exception 'email_taken';
+    end if;
+
+    return json_build_object('user_id', v_user_id, 'company_id', v_company_id);
+end;
+$$;
+
+-- Only the backend (service role) may create accounts this way.
+revoke execute on function public.signup_user(text, text, text) from public, anon, authenticated;
@@ -0,0 +1,15 @@
+-- Indexes backing the per-request lookups in main.py.
+
+-- Emails are stored lowercased by the API; normalise existing rows so the
+-- plain btree index below serves `email = ?` lookups from login/signup.
+-- This fails if two accounts differ only by email case; merge those first.
+update users set email = lower(email) where email <> lower(email);
+
+-- Point lookup for login, and the conflict target for signup_user's
+-- ON CONFLICT so concurrent signups cannot register the same email twice.
+create unique index if not exists users_email_idx on users (email);
+
+-- Latest dashboard row per company: ORDER BY created_at DESC LIMIT 1 is
+-- served straight from the index without a sort.
+create index if not exists dashboard_data_company_created_idx
+    on dashboard_data (company_id, created_at desc);
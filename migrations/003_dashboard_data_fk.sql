@@ -0,0 +1,19 @@
+-- PostgREST embeds dashboard_data inside companies (GET /dashboard) by
+-- following this foreign key.
+do $$
+begin
+    if not exists (
+        select 1
+        from pg_constraint
+        where conrelid = 'dashboard_data'::regclass
+          and confrelid = 'companies'::regclass
+          and contype = 'f'
+    ) then
+        alter table dashboard_data
+            add constraint dashboard_data_company_id_fkey
+            foreign key (company_id) references companies (id);
+    end if;
+end;
+$$;
+
+notify pgrst, 'reload schema';
@@ -0,0 +1,73 @@
+-- Keeps each company's newest dashboard_data row in a table keyed by
+-- company_id, so GET /dashboard is a primary-key lookup instead of an
+-- ORDER BY created_at DESC LIMIT 1 over dashboard_data.
+
+create table if not exists latest_dashboard_data (
+    company_id bigint primary key references companies (id) on delete cascade,
+    data_json jsonb,
+    created_at timestamptz not null
+);
+
+-- Only the backend (service role, which bypasses RLS) may read or write it.
+alter table latest_dashboard_data enable row level security;
+revoke all on latest_dashboard_data from anon, authenticated;
+
+-- Rebuilds a company's row from dashboard_data after an update or delete.
+create or replace function public.refresh_latest_dashboard_data(p_company_id bigint)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+    delete from latest_dashboard_data where company_id = p_company_id;
+
+    insert into latest_dashboard_data (company_id, data_json, created_at)
+    select company_id, data_json, created_at
+    from dashboard_data
+    where company_id = p_company_id
+    order by created_at desc
+    limit 1;
+$$;
+
+revoke execute on function public.refresh_latest_dashboard_data(bigint) from public, anon, authenticated;
+
+create or replace function public.sync_latest_dashboard_data()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'INSERT' then
+        insert into latest_dashboard_data (company_id, data_json, created_at)
+        values (new.company_id, new.data_json, new.created_at)
+        on conflict (company_id) do update
+            set data_json = excluded.data_json,
+                created_at = excluded.created_at
+            where latest_dashboard_data.created_at <= excluded.created_at;
+    else
+        perform public.refresh_latest_dashboard_data(old.company_id);
+
+        if tg_op = 'UPDATE' and new.company_id is distinct from old.company_id then
+            perform public.refresh_latest_dashboard_data(new.company_id);
+        end if;
+    end if;
+
+    return null;
+end;
+$$;
+
+drop trigger if exists dashboard_data_sync_latest on dashboard_data;
+
+create trigger dashboard_data_sync_latest
+    after insert or update or delete on dashboard_data
+    for each row execute function public.sync_latest_dashboard_data();
+
+-- Backfill from existing history.
+insert into latest_dashboard_data (company_id, data_json, created_at)
+select distinct on (company_id) company_id, data_json, created_at
+from dashboard_data
+order by company_id, created_at desc
+on conflict (company_id) do nothing;
+
+notify pgrst, 'reload schema';
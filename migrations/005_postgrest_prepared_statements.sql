@@ -0,0 +1,8 @@
+-- Keep PostgREST's prepared statements on so the handful of query shapes
+-- main.py sends (company by id, user by email, signup_user) reuse cached
+-- plans. PostgREST holds its own pool of direct Postgres connections; do
+-- not point it at the transaction-mode pooler (:6543), which cannot carry
+-- prepared statements across transactions.
+alter role authenticator set pgrst.db_prepared_statements = 'true';
+
+notify pgrst, 'reload config';
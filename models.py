@@ -10,26 +10,10 @@ class ShopifyCredentials(BaseModel):
     api_secret: Optional[str] = None
 
 
-class SettingsResponse(BaseModel):
-    company_id: str
-    shopify: Optional[ShopifyCredentials] = None
-
-
 class SettingsUpdateRequest(BaseModel):
     shopify: ShopifyCredentials
 
 
-class DashboardMetrics(BaseModel):
-    total_revenue: Optional[float] = None
-    total_customers: Optional[int] = None
-    active_subscriptions: Optional[int] = None
-
-
-class DashboardResponse(BaseModel):
-    company_id: str
-    metrics: DashboardMetrics
-
-
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -51,13 +35,6 @@ class SignupResponse(BaseModel):
     companyId: str
 
 
-class UserResponse(BaseModel):
-    id: int
-    email: str
-    company_id: int
-    created_at: str
-
-
 class CompanyResponse(BaseModel):
     id: int
     name: str
@@ -1,8 +1,12 @@
 import os
-from functools import lru_cache
+from typing import Dict, Union
 
+import httpx
 from dotenv import load_dotenv
-from supabase import Client, create_client
+from gotrue import AsyncMemoryStorage
+from postgrest import AsyncPostgrestClient
+from supabase import ClientOptions
+from supabase._async.client import AsyncClient
 
 
 load_dotenv()
@@ -10,6 +14,7 @@ load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+POSTGREST_TIMEOUT = 10.0
 
 
 if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
@@ -18,12 +23,66 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     )
 
 
-@lru_cache
-def get_supabase() -> Client:
+class _PooledPostgrestClient(AsyncPostgrestClient):
     """
-    Returns a cached Supabase client instance using service role key.
+    PostgREST client whose HTTP session keeps a larger keep-alive pool.
     """
 
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+    ) -> httpx.AsyncClient:
+        # Same settings as postgrest-py's own session, plus the pool limits
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        )
 
 
+class _PooledAsyncClient(AsyncClient):
+    """
+    Supabase client that builds its PostgREST client with the pooled session.
+    """
+
+    @staticmethod
+    def _init_postgrest_client(
+        rest_url: str,
+        headers: Dict[str, str],
+        schema: str,
+        timeout: Union[int, float, httpx.Timeout] = POSTGREST_TIMEOUT,
+    ) -> AsyncPostgrestClient:
+        return _PooledPostgrestClient(
+            rest_url, headers=headers, schema=schema, timeout=timeout
+        )
+
+
+def _create_client() -> AsyncClient:
+    """
+    Builds the async Supabase client using service role key.
+    """
+
+    options = ClientOptions(
+        storage=AsyncMemoryStorage(),
+        postgrest_client_timeout=POSTGREST_TIMEOUT,
+        storage_client_timeout=POSTGREST_TIMEOUT,
+    )
+    return _PooledAsyncClient(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options)
+
+
+_client: AsyncClient = _create_client()
+
+
+async def get_supabase() -> AsyncClient:
+    """
+    Returns the shared async Supabase client instance.
+    """
+
+    return _client